@@ -1,16 +1,16 @@
 import os
-import subprocess
 import streamlit as st
 import shutil
 import base64
-from streamlit_autorefresh import st_autorefresh
-import psutil
-import zipfile
+import io
 from urllib.parse import urlparse
-import random
+import re
 import sys
 import atexit
 import signal
+import time
+import threading
+import glob
 
 # ----------------------------- Streamlit Page Configuration -----------------------------
 
@@ -25,94 +25,204 @@ st.set_page_config(
 DOWNLOADED_PDFS_DIR = "downloaded_pdfs"
 LOG_FILE = "pdfcrawler.log"
 PID_FILE = "crawler.pid"
+ZIP_FILE = "downloaded_pdfs.zip"
+LOG_TAIL_MAX = 256 * 1024  # characters of log kept in memory for the UI
+PROGRESS_RE = re.compile(r"PROGRESS pdfs_downloaded=(\d+) pdfs_checked=(\d+) pdfs_seen=(\d+)")
 
-# ----------------------------- Initialize Session State -----------------------------
-
-if 'crawl_count' not in st.session_state:
-    st.session_state['crawl_count'] = 0
-
-if 'pdf_list' not in st.session_state:
-    st.session_state['pdf_list'] = []
+# static page styles; only the background image rule is built at runtime (see _build_app_css)
+APP_CSS = """
+        .chat-bubble {
+            background: rgba(255, 255, 255, 0.9);
+            border-radius: 10px;
+            padding: 15px;
+            margin-bottom: 10px;
+            box-shadow: 2px 2px 5px rgba(0,0,0,0.1);
+            max-height: 400px;
+            overflow-y: auto;
+            white-space: pre-wrap;
+            font-family: monospace;
+            font-size: 14px;
+        }
+        .logo { text-align: center; margin-bottom: 20px; }
+        .logo img { max-width: 200px; }
+        .footer {
+            position: fixed; left: 0; bottom: 0; width: 100%;
+            text-align: center; color: #999999; font-size: 12px; padding: 10px;
+        }
+"""
 
-if 'is_crawling' not in st.session_state:
-    st.session_state['is_crawling'] = False
+# ----------------------------- Initialize Session State -----------------------------
 
-if 'app_initialized' not in st.session_state:
-    st.session_state['app_initialized'] = False
+SESSION_DEFAULTS = {
+    'crawl_count': 0,
+    'pdf_list': [],
+    'is_crawling': False,
+    'app_initialized': False,
+    'log_offset': 0,
+    'log_tail': '',
+    'crawler_proc': None,
+    'crawler_pid': None,
+    'running_cache': None,  # (monotonic time, is_crawler_running result)
+    'zip_sig': None,
+    'prepared_pdf': None,  # filename whose download button is armed
+}
+for key, value in SESSION_DEFAULTS.items():
+    st.session_state.setdefault(key, value)
 
 # ----------------------------- Helper Functions -----------------------------
 
 def is_crawler_running():
-    if os.path.exists(PID_FILE):
+    """
+    Cheap liveness check for the crawler, run on every rerun. The answer is reused for a
+    second, so the sidebar and the live tabs of one run share a single check.
+    """
+    cached = st.session_state['running_cache']
+    now = time.monotonic()
+    if cached is not None and now - cached[0] < 1.0:
+        return cached[1]
+    running = _check_crawler_running()
+    st.session_state['running_cache'] = (now, running)
+    return running
+
+def _check_crawler_running():
+    """
+    Uses the Popen handle when this session spawned the crawler (a single waitpid), otherwise
+    the PID adopted from PID_FILE. The PID file is only verified (pid + create time) once,
+    when a reloaded session adopts a crawler it did not start.
+    """
+    import psutil
+    proc = st.session_state['crawler_proc']
+    if proc is not None:
+        if proc.poll() is None:
+            return True
+        st.session_state['crawler_proc'] = None
+        _remove_pid_file()
+        return False
+
+    pid = st.session_state['crawler_pid']
+    if pid is not None:
+        if _pid_alive(pid):
+            return True
+        st.session_state['crawler_pid'] = None
+        _remove_pid_file()
+        return False
+
+    record = _read_pid_file()
+    if record is not None:
+        pid, started, _ = record
         try:
-            with open(PID_FILE, 'r') as f:
-                pid = int(f.read().strip())
-            if psutil.pid_exists(pid):
-                p = psutil.Process(pid)
-                # ensure it is our crawler
-                if 'python' in p.name().lower() and any('pdf_crawler.py' in ' '.join(c.cmdline()) for c in [p]):
-                    return True
-            # stale PID file
-            os.remove(PID_FILE)
-        except Exception:
-            if os.path.exists(PID_FILE):
-                os.remove(PID_FILE)
+            # ensure it is our crawler and not a recycled PID
+            if _pid_alive(pid) and abs(psutil.Process(pid).create_time() - started) < 1.0:
+                st.session_state['crawler_pid'] = pid
+                return True
+        except psutil.Error:
+            pass
+        # stale PID file
+        _remove_pid_file()
     return False
 
-def _kill_process_group(pid: int, timeout: float = 5.0):
-    """Terminate the whole process group (crawler + its children) robustly."""
+def _pid_alive(pid):
+    """
+    True if pid is running. A crawler adopted from PID_FILE has no Popen handle to reap it,
+    so once it exits it lingers as a zombie; pid_exists alone would report it as running.
+    """
+    import psutil
     try:
-        if hasattr(os, "getpgid") and hasattr(os, "killpg"):
-            pgid = os.getpgid(pid)
-            # Graceful terminate first
-            os.killpg(pgid, signal.SIGTERM)
-        else:
-            # Windows / no killpg: terminate children via psutil
-            if psutil.pid_exists(pid):
-                proc = psutil.Process(pid)
-                for child in proc.children(recursive=True):
-                    child.terminate()
-                proc.terminate()
-    except Exception:
+        if psutil.Process(pid).status() != psutil.STATUS_ZOMBIE:
+            return True
+    except psutil.Error:
+        return False
+    try:
+        os.waitpid(pid, os.WNOHANG)  # reap it if it is our child
+    except (ChildProcessError, OSError, AttributeError):
         pass
+    return False
 
-    # wait a bit
+def _read_pid_file():
+    """(pid, create_time, pgid) recorded by start_crawler, or None if missing or garbled."""
     try:
-        if psutil.pid_exists(pid):
-            proc = psutil.Process(pid)
-            proc.wait(timeout=timeout)
-    except Exception:
+        with open(PID_FILE, 'r') as f:
+            pid, started, pgid = f.read().split()
+        return int(pid), float(started), int(pgid)
+    except (FileNotFoundError, ValueError):
+        return None
+
+def _write_pid_file(pid, started, pgid):
+    # write-then-rename so a concurrent rerun never sees a half-written file
+    tmp = f"{PID_FILE}.tmp"
+    with open(tmp, 'w') as f:
+        f.write(f"{pid} {started} {pgid}")
+    os.replace(tmp, PID_FILE)
+
+def _remove_pid_file():
+    try:
+        os.remove(PID_FILE)
+    except FileNotFoundError:
         pass
 
-    # force kill if still alive
-    if psutil.pid_exists(pid):
-        try:
-            if hasattr(os, "getpgid") and hasattr(os, "killpg"):
-                pgid = os.getpgid(pid)
-                os.killpg(pgid, signal.SIGKILL)
-            else:
-                proc = psutil.Process(pid)
-                for child in proc.children(recursive=True):
-                    try:
-                        child.kill()
-                    except Exception:
-                        pass
+def _kill_process_group(pid: int, pgid: int, timeout: float = 5.0, proc=None):
+    """
+    Terminate the whole process group (crawler + its children) robustly.
+    pgid is the group recorded at spawn time. Pass the Popen handle as proc when this session
+    owns the crawler: waiting is then a plain waitpid instead of polling the PID.
+    """
+    # Graceful terminate first
+    _signal_process_group(pid, pgid, force=False)
+    # wait a bit, then force kill if still alive
+    if not _wait_for_exit(pid, timeout, proc):
+        _signal_process_group(pid, pgid, force=True)
+
+def _signal_process_group(pid: int, pgid: int, force: bool):
+    import psutil
+    try:
+        if hasattr(os, "killpg"):
+            # the stored pgid, not os.getpgid(pid): that fails once the crawler itself has
+            # exited, which would leave Chrome/ChromeDriver running in the group
+            os.killpg(pgid, signal.SIGKILL if force else signal.SIGTERM)
+        elif force:
+            # Windows: taskkill /T takes down the crawler's whole process tree
+            import subprocess
+            subprocess.run(["taskkill", "/F", "/T", "/PID", str(pid)],
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        else:
+            # Windows graceful: terminate children first via psutil
+            proc = psutil.Process(pid)
+            for child in proc.children(recursive=True):
                 try:
-                    proc.kill()
-                except Exception:
+                    child.terminate()
+                except psutil.Error:
                     pass
-        except Exception:
-            pass
+            proc.terminate()
+    except (OSError, psutil.Error):
+        pass
 
-def start_crawler(url, scope, render_mode, max_pages, max_pdfs, delay_s, obey_robots):
+def _wait_for_exit(pid: int, timeout: float, proc=None) -> bool:
+    import subprocess
+    if proc is not None:
+        try:
+            proc.wait(timeout=timeout)
+            return True
+        except subprocess.TimeoutExpired:
+            return False
+    deadline = time.monotonic() + timeout
+    # _pid_alive, not pid_exists: an exited crawler we spawned stays a zombie until reaped
+    while _pid_alive(pid):
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(0.1)
+    return True
+
+def start_crawler(url, scope, render_mode, max_pages, max_pdfs, delay_s, obey_robots, workers):
     """
     Starts the PDF crawler as a subprocess in its own process group and writes its PID to PID_FILE.
     """
+    import subprocess
+    import psutil
     # Fresh logs and downloads
     if os.path.exists(LOG_FILE):
         os.remove(LOG_FILE)
-    if os.path.exists(DOWNLOADED_PDFS_DIR):
-        shutil.rmtree(DOWNLOADED_PDFS_DIR)
+    reset_log_tail()
+    discard_dir(DOWNLOADED_PDFS_DIR)
 
     cmd = [
         sys.executable, 'pdf_crawler.py', url,
@@ -121,6 +231,7 @@ def start_crawler(url, scope, render_mode, max_pages, max_pdfs, delay_s, obey_ro
         '--max-pages', str(max_pages),
         '--max-pdfs', str(max_pdfs),
         '--delay', str(delay_s),
+        '--workers', str(workers),
     ]
     cmd += ['--respect-robots' if obey_robots else '--ignore-robots']
 
@@ -128,16 +239,26 @@ def start_crawler(url, scope, render_mode, max_pages, max_pdfs, delay_s, obey_ro
     # (Equivalent to setsid; safer than preexec_fn on multithreaded envs.)
     # Docs: start_new_session parameter. 
     # https://docs.python.org/3/library/subprocess.html  (Popen)
+    if os.name == 'nt':
+        group_kwargs = {'creationflags': subprocess.CREATE_NEW_PROCESS_GROUP}
+    else:
+        group_kwargs = {'start_new_session': True}  # <--- critical
     process = subprocess.Popen(
         cmd,
-        stdout=subprocess.DEVNULL,
-        stderr=subprocess.DEVNULL,
-        text=True,
-        start_new_session=True  # <--- critical
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,   # never PIPE: nobody drains it, the child would block
+        stderr=subprocess.DEVNULL,   # once the 64 KB pipe buffer fills. Output goes to LOG_FILE.
+        close_fds=True,
+        **group_kwargs
     )
 
-    with open(PID_FILE, 'w') as f:
-        f.write(str(process.pid))
+    # as session leader the crawler's pgid is its pid; recorded so stopping never needs getpgid
+    pgid = os.getpgid(process.pid) if hasattr(os, 'getpgid') else process.pid
+    _write_pid_file(process.pid, psutil.Process(process.pid).create_time(), pgid)
+
+    st.session_state['crawler_proc'] = process
+    st.session_state['crawler_pid'] = None
+    st.session_state['running_cache'] = None
 
     st.session_state['crawl_count'] += 1
     st.session_state['is_crawling'] = True
@@ -150,38 +271,32 @@ def start_crawler(url, scope, render_mode, max_pages, max_pdfs, delay_s, obey_ro
 
 def stop_crawler():
     """
-    Stops the PDF crawler subprocess by reading the PID file and terminating the WHOLE PROCESS GROUP.
+    Stops the PDF crawler subprocess and terminates the WHOLE PROCESS GROUP.
+    Uses this session's Popen handle if it has one, else the PID recorded in PID_FILE.
     """
-    if not os.path.exists(PID_FILE):
+    proc = st.session_state['crawler_proc']
+    record = _read_pid_file()
+    if proc is None and record is None:
+        _remove_pid_file()
         st.sidebar.warning("No active crawler to stop.")
         return
+    pid = proc.pid if proc is not None else record[0]
+    pgid = record[2] if record is not None else pid
 
     try:
-        with open(PID_FILE, 'r') as f:
-            pid = int(f.read().strip())
-    except Exception as e:
-        st.sidebar.error(f"Bad PID file: {e}")
-        try:
-            os.remove(PID_FILE)
-        except Exception:
-            pass
-        return
-
-    try:
-        if psutil.pid_exists(pid):
-            _kill_process_group(pid, timeout=5.0)
+        if proc is not None or _pid_alive(pid):
+            _kill_process_group(pid, pgid, timeout=5.0, proc=proc)
             st.sidebar.success("Crawler stopped successfully.")
         else:
             st.sidebar.info("Crawler process not found. It may have already stopped.")
     except Exception as e:
         st.sidebar.error(f"Error stopping crawler: {e}")
     finally:
-        if os.path.exists(PID_FILE):
-            try:
-                os.remove(PID_FILE)
-            except Exception:
-                pass
+        _remove_pid_file()
         st.session_state['is_crawling'] = False
+        st.session_state['crawler_proc'] = None
+        st.session_state['crawler_pid'] = None
+        st.session_state['running_cache'] = None
         # immediate UI refresh
         try:
             st.rerun()
@@ -189,31 +304,179 @@ def stop_crawler():
             st.experimental_rerun()
 
 def read_log():
-    if os.path.exists(LOG_FILE):
-        with open(LOG_FILE, 'r', encoding="utf-8", errors="ignore") as f:
-            return f.read()
-    return "No logs available."
+    """
+    Returns the tail of the crawler log, reading only the lines appended since the last call.
+    The byte offset and the cached tail live in st.session_state; a shrinking file (new run,
+    cleared logs) resets both.
+    """
+    try:
+        # binary + 1 MB buffer: the first read of a large log is a few big read(2) calls,
+        # later ones only fetch the new bytes; decoding happens once on the complete lines
+        with open(LOG_FILE, 'rb', buffering=1 << 20) as f:
+            size = f.seek(0, os.SEEK_END)
+            offset = st.session_state['log_offset']
+            if size < offset:
+                reset_log_tail()
+                offset = 0
+            f.seek(offset)
+            chunk = f.read(size - offset)
+    except FileNotFoundError:
+        reset_log_tail()
+        return "No logs available."
+
+    # only consume complete lines so a half-written record is picked up whole next time
+    end = chunk.rfind(b"\n") + 1
+    if end:
+        tail = st.session_state['log_tail'] + chunk[:end].decode("utf-8", errors="ignore")
+        st.session_state['log_tail'] = tail[-LOG_TAIL_MAX:]
+        st.session_state['log_offset'] = offset + end
+    return st.session_state['log_tail'] or "No logs available."
+
+def parse_progress(log_content):
+    """(downloaded, checked, seen) from the crawler's last PROGRESS line, or None."""
+    pos = log_content.rfind("PROGRESS ")
+    m = PROGRESS_RE.match(log_content, pos) if pos >= 0 else None
+    return tuple(int(g) for g in m.groups()) if m else None
+
+def reset_log_tail():
+    st.session_state['log_offset'] = 0
+    st.session_state['log_tail'] = ''
 
 def list_pdfs():
-    if os.path.exists(DOWNLOADED_PDFS_DIR):
-        pdf_files = sorted(os.listdir(DOWNLOADED_PDFS_DIR))
+    try:
+        dir_mtime = os.stat(DOWNLOADED_PDFS_DIR).st_mtime_ns
+    except FileNotFoundError:
+        return []
+    pdf_files = _scan_pdf_dir(DOWNLOADED_PDFS_DIR, dir_mtime)
+    if st.session_state['pdf_list'] != pdf_files:
         st.session_state['pdf_list'] = pdf_files
-        return pdf_files
-    return []
+    return st.session_state['pdf_list']
+
+@st.cache_data(show_spinner=False, ttl=60)
+def _scan_pdf_dir(path, dir_mtime):
+    # dir_mtime changes whenever a file is added, renamed or removed, so an
+    # unchanged directory is a cache hit instead of a fresh scan
+    with os.scandir(path) as it:
+        # *.part files are downloads still in progress
+        return sorted(e.name for e in it if e.is_file() and not e.name.endswith(".part"))
 
 def get_base64_encoded_image(image_path):
-    if not os.path.exists(image_path):
+    try:
+        mtime_ns = os.stat(image_path).st_mtime_ns
+    except FileNotFoundError:
         return ""
+    return _encode_image(image_path, mtime_ns)
+
+@st.cache_data(show_spinner=False)
+def _encode_image(image_path, mtime_ns):
+    # mtime_ns is part of the cache key so an edited image is re-encoded
     with open(image_path, 'rb') as img_file:
         encoded = base64.b64encode(img_file.read()).decode()
     return encoded
 
-def create_zip_file():
-    zip_filename = "downloaded_pdfs.zip"
-    with zipfile.ZipFile(zip_filename, 'w') as zipf:
-        for pdf_file in st.session_state.get('pdf_list', []):
-            zipf.write(os.path.join(DOWNLOADED_PDFS_DIR, pdf_file), pdf_file)
-    return zip_filename
+def get_thumbnail_base64(image_path, max_size=400):
+    """Base64 PNG of the image shrunk to fit max_size x max_size (aspect ratio kept)."""
+    try:
+        mtime_ns = os.stat(image_path).st_mtime_ns
+    except FileNotFoundError:
+        return ""
+    return _encode_thumbnail(image_path, mtime_ns, max_size)
+
+@st.cache_data(show_spinner=False)
+def _encode_thumbnail(image_path, mtime_ns, max_size):
+    from PIL import Image  # ships with streamlit
+    with Image.open(image_path) as img:
+        img.thumbnail((max_size, max_size))
+        buf = io.BytesIO()
+        img.save(buf, format="PNG", optimize=True)
+    return base64.b64encode(buf.getvalue()).decode()
+
+def get_app_css():
+    try:
+        background_mtime = os.stat('background.png').st_mtime_ns
+    except FileNotFoundError:
+        background_mtime = None
+    return _build_app_css(background_mtime)
+
+@st.cache_data(show_spinner=False)
+def _build_app_css(background_mtime):
+    """The page <style> block, assembled once per background.png version."""
+    background_css = ""
+    if background_mtime is not None:
+        background = get_base64_encoded_image('background.png')
+        background_css = f"""
+        .stApp {{
+            background-image: url("data:image/png;base64,{background}");
+            background-size: cover;
+            background-repeat: no-repeat;
+            background-attachment: fixed;
+            background-position: center;
+        }}"""
+    return f"<style>{background_css}{APP_CSS}</style>"
+
+def zip_signature():
+    """(name, size, mtime) of every listed PDF; the ZIP is current while this is unchanged."""
+    entries = []
+    for pdf_file in st.session_state.get('pdf_list', []):
+        path = os.path.join(DOWNLOADED_PDFS_DIR, pdf_file)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            continue
+        entries.append((pdf_file, stat.st_size, stat.st_mtime_ns))
+    return tuple(entries)
+
+def zip_is_current(sig):
+    if st.session_state['zip_sig'] == sig and os.path.exists(ZIP_FILE):
+        return True
+    # a new session (page reload) has no signature yet: trust a ZIP on disk that is newer than
+    # every PDF and lists exactly the same files, instead of offering to rebuild it
+    try:
+        zip_mtime = os.stat(ZIP_FILE).st_mtime_ns
+    except FileNotFoundError:
+        return False
+    if not sig or zip_mtime < max(mtime for _, _, mtime in sig):
+        return False
+    import zipfile
+    try:
+        with zipfile.ZipFile(ZIP_FILE) as zf:
+            current = zf.namelist() == [name for name, _, _ in sig]
+    except (OSError, zipfile.BadZipFile):
+        return False
+    if current:
+        st.session_state['zip_sig'] = sig
+    return current
+
+def create_zip_file(sig):
+    """
+    Builds the ZIP of downloaded PDFs. Only called when the user asks for it, never on a
+    polling rerun. PDFs are already compressed, so they are stored as-is and streamed in 1 MB chunks.
+    """
+    import zipfile
+    with zipfile.ZipFile(ZIP_FILE, 'w', compression=zipfile.ZIP_STORED, allowZip64=True) as zipf:
+        for pdf_file, _, _ in sig:
+            path = os.path.join(DOWNLOADED_PDFS_DIR, pdf_file)
+            info = zipfile.ZipInfo.from_file(path, pdf_file)
+            with open(path, 'rb', buffering=1 << 20) as src, zipf.open(info, 'w') as dst:
+                shutil.copyfileobj(src, dst, length=1 << 20)
+    st.session_state['zip_sig'] = sig
+    return ZIP_FILE
+
+def discard_dir(path):
+    """
+    Removes a directory without blocking the UI: it is renamed aside (atomic, independent of
+    how many PDFs it holds) and the actual rmtree runs in a daemon thread.
+    """
+    trash = f"{path}.trash.{os.getpid()}.{time.monotonic_ns()}"
+    try:
+        os.rename(path, trash)
+    except FileNotFoundError:
+        return
+    except OSError:
+        # e.g. Windows refuses to rename a folder with open files: delete in place
+        shutil.rmtree(path, ignore_errors=True)
+        return
+    threading.Thread(target=shutil.rmtree, args=(trash,), kwargs={'ignore_errors': True}, daemon=True).start()
 
 def validate_url(url):
     try:
@@ -224,88 +487,135 @@ def validate_url(url):
 
 def cleanup_on_start():
     # Stop any running crawler from previous sessions
-    if os.path.exists(PID_FILE):
-        try:
-            with open(PID_FILE, 'r') as f:
-                pid = int(f.read().strip())
-            if psutil.pid_exists(pid):
-                _kill_process_group(pid, timeout=5.0)
-        except Exception:
-            pass
-        try:
-            os.remove(PID_FILE)
-        except Exception:
-            pass
+    record = _read_pid_file()
+    if record is not None:
+        if _pid_alive(record[0]):
+            _kill_process_group(record[0], record[2], timeout=5.0)
+        _remove_pid_file()
 
     # Fresh start
     if os.path.exists(LOG_FILE):
         os.remove(LOG_FILE)
-    if os.path.exists(DOWNLOADED_PDFS_DIR):
-        shutil.rmtree(DOWNLOADED_PDFS_DIR)
+    reset_log_tail()
+    discard_dir(DOWNLOADED_PDFS_DIR)
+    # trash left behind by a server that exited mid-delete (ours is handled by its thread)
+    for leftover in glob.glob(f"{DOWNLOADED_PDFS_DIR}.trash.*"):
+        if not leftover.startswith(f"{DOWNLOADED_PDFS_DIR}.trash.{os.getpid()}."):
+            shutil.rmtree(leftover, ignore_errors=True)
     st.session_state['is_crawling'] = False
     st.session_state['pdf_list'] = []
 
 def cleanup_on_exit():
-    # Try to stop any running crawler on app shutdown
-    if os.path.exists(PID_FILE):
-        try:
-            with open(PID_FILE, 'r') as f:
-                pid = int(f.read().strip())
-            if psutil.pid_exists(pid):
-                _kill_process_group(pid, timeout=3.0)
-        except Exception:
-            pass
-        try:
-            os.remove(PID_FILE)
-        except Exception:
-            pass
-
-atexit.register(cleanup_on_exit)
+    # Try to stop any running crawler on app shutdown. Runs outside any script run,
+    # so it must stay free of st.* calls.
+    record = _read_pid_file()
+    if record is not None:
+        if _pid_alive(record[0]):
+            _kill_process_group(record[0], record[2], timeout=3.0)
+        _remove_pid_file()
+
+@st.cache_resource(show_spinner=False)
+def _register_exit_cleanup():
+    # app.py is re-executed on every rerun; cache_resource makes this run once per server
+    # process instead of stacking another atexit handler each time.
+    atexit.register(cleanup_on_exit)
+    return True
+
+_register_exit_cleanup()
 
 # ----------------------------- Streamlit Interface -----------------------------
 
+def render_tabs():
+    """Status, downloads and logs. Runs as a fragment so polling reruns only this part."""
+    crawler_running = is_crawler_running()
+    if crawler_running != st.session_state['is_crawling']:
+        # crawl started/finished since the last full run: refresh the sidebar buttons too
+        st.session_state['is_crawling'] = crawler_running
+        st.rerun()
+    log_content = read_log()
+
+    tabs = st.tabs(["Home", "Downloaded PDFs", "Logs"])
+
+    with tabs[0]:
+        st.header("📊 Crawling Status")
+        status_display = st.empty()
+        progress_bar = st.empty()
+        if crawler_running:
+            proc = st.session_state['crawler_proc']
+            pid = proc.pid if proc is not None else st.session_state['crawler_pid']
+            status_display.info(f"Crawling in progress. Process PID: {pid}")
+            progress = parse_progress(log_content)
+            if progress:
+                downloaded, checked, seen = progress
+                progress_bar.progress(
+                    min(checked / seen, 1.0) if seen else 0.0,
+                    text=f"{downloaded} PDF(s) downloaded, {checked} of {seen} candidate(s) checked"
+                )
+            else:
+                progress_bar.progress(0, text="Looking for PDFs...")
+        else:
+            if "Crawling completed successfully." in log_content:
+                status_display.success("Crawling completed successfully.")
+            elif "Crawling has been stopped by the user." in log_content:
+                status_display.warning("Crawling stopped by user.")
+            else:
+                status_display.info("Idle")
+            progress_bar.empty()
+
+    with tabs[1]:
+        st.header("📄 Downloaded PDFs")
+        pdf_list = list_pdfs()
+        if pdf_list:
+            q = st.text_input("Filter by filename:", value="")
+            show = [p for p in pdf_list if q.lower() in p.lower()]
+            if not show:
+                st.info("No matching PDFs.")
+            else:
+                st.markdown(f'<div class="chat-bubble">{"<br>".join(show)}</div>', unsafe_allow_html=True)
+                # Only the selected file is read into memory, and only once asked for: this tab
+                # reruns every 2 s during a crawl, and the selectbox always has a selection.
+                pick = st.selectbox("Select a PDF to download:", show)
+                if st.session_state['prepared_pdf'] == pick or st.button(f"Prepare {pick} 📄"):
+                    st.session_state['prepared_pdf'] = pick
+                    with open(os.path.join(DOWNLOADED_PDFS_DIR, pick), "rb") as f:
+                        st.download_button(
+                            label=f"Download {pick} 📄",
+                            data=f,
+                            file_name=pick,
+                            mime="application/pdf"
+                        )
+                sig = zip_signature()
+                zip_ready = zip_is_current(sig)
+                if zip_ready or st.button("Prepare ZIP of all PDFs 🗜️"):
+                    zip_filename = ZIP_FILE if zip_ready else create_zip_file(sig)
+                    with open(zip_filename, "rb") as f:
+                        st.download_button(
+                            label="Download All PDFs 📥",
+                            data=f,
+                            file_name=zip_filename,
+                            mime="application/zip"
+                        )
+        else:
+            st.info("No PDFs downloaded yet.")
+
+    with tabs[2]:
+        st.header("📝 Logs")
+        st.markdown(f"<div class='chat-bubble'><pre>{log_content}</pre></div>", unsafe_allow_html=True)
+
+
+def _live(render, run_every):
+    """Runs render() as a self-refreshing fragment (every run_every seconds, None = never)."""
+    st.fragment(run_every=run_every)(render)()
+
 def main():
     if not st.session_state['app_initialized']:
         cleanup_on_start()
         st.session_state['app_initialized'] = True
 
-    st_autorefresh(interval=5000, limit=None, key="auto_refresh")
-
-    background = get_base64_encoded_image('background.png')
-    logo = get_base64_encoded_image('tyrone-logo.png')
+    # the logo is displayed at most 200px wide; shipping the full-size PNG on every rerun is waste
+    logo = get_thumbnail_base64('tyrone-logo.png')
 
-    st.markdown(
-        f"""
-        <style>
-        .stApp {{
-            background-image: url("data:image/png;base64,{background}");
-            background-size: cover;
-            background-repeat: no-repeat;
-            background-attachment: fixed;
-            background-position: center;
-        }}
-        .chat-bubble {{
-            background: rgba(255, 255, 255, 0.9);
-            border-radius: 10px;
-            padding: 15px;
-            margin-bottom: 10px;
-            box-shadow: 2px 2px 5px rgba(0,0,0,0.1);
-            max-height: 400px;
-            overflow-y: auto;
-            white-space: pre-wrap;
-            font-family: monospace;
-            font-size: 14px;
-        }}
-        .logo {{ text-align: center; margin-bottom: 20px; }}
-        .logo img {{ max-width: 200px; }}
-        .footer {{
-            position: fixed; left: 0; bottom: 0; width: 100%;
-            text-align: center; color: #999999; font-size: 12px; padding: 10px;
-        }}
-        </style>
-        """,
-        unsafe_allow_html=True
-    )
+    st.markdown(get_app_css(), unsafe_allow_html=True)
 
     if logo:
         st.markdown(f"""<div class="logo"><img src="data:image/png;base64,{logo}" alt="Logo"></div>""", unsafe_allow_html=True)
@@ -338,6 +648,7 @@ def main():
         max_pages = st.number_input("Max pages to crawl", min_value=1, max_value=10000, value=100, step=10)
         max_pdfs = st.number_input("Max PDFs to download", min_value=1, max_value=10000, value=200, step=10)
         delay_s   = st.number_input("Delay between requests (seconds)", min_value=0.0, max_value=10.0, value=0.5, step=0.1)
+        workers   = st.number_input("Parallel downloads", min_value=1, max_value=16, value=4, step=1)
         obey_robots = st.checkbox("Respect robots.txt", value=True)
 
     st.sidebar.markdown("---")
@@ -345,8 +656,7 @@ def main():
     # Utility actions
     c1, c2 = st.sidebar.columns(2)
     if c1.button("Clear Downloads 🧹"):
-        if os.path.exists(DOWNLOADED_PDFS_DIR):
-            shutil.rmtree(DOWNLOADED_PDFS_DIR)
+        discard_dir(DOWNLOADED_PDFS_DIR)
         st.session_state['pdf_list'] = []
         st.sidebar.success("Cleared downloaded PDFs.")
         try:
@@ -357,6 +667,7 @@ def main():
     if c2.button("Clear Logs 📝"):
         if os.path.exists(LOG_FILE):
             os.remove(LOG_FILE)
+        reset_log_tail()
         st.sidebar.success("Cleared logs.")
         try:
             st.rerun()
@@ -364,7 +675,8 @@ def main():
             st.experimental_rerun()
 
     crawler_running = is_crawler_running()
-    st.session_state['is_crawling'] = crawler_running
+    if st.session_state['is_crawling'] != crawler_running:
+        st.session_state['is_crawling'] = crawler_running
 
     # Start/Stop
     if not crawler_running:
@@ -381,7 +693,8 @@ def main():
                     max_pages=int(max_pages),
                     max_pdfs=int(max_pdfs),
                     delay_s=float(delay_s),
-                    obey_robots=obey_robots
+                    obey_robots=obey_robots,
+                    workers=int(workers)
                 )
     else:
         if st.sidebar.button("Stop Crawling 🛑"):
@@ -389,64 +702,8 @@ def main():
 
     st.sidebar.markdown(f"**Crawl Count:** {st.session_state.get('crawl_count', 0)}")
 
-    # Tabs
-    tabs = st.tabs(["Home", "Downloaded PDFs", "Logs"])
-
-    with tabs[0]:
-        st.header("📊 Crawling Status")
-        status_display = st.empty()
-        progress_bar = st.progress(0)
-        log_content = read_log()
-        if crawler_running:
-            try:
-                with open(PID_FILE, 'r') as f:
-                    pid = int(f.read().strip())
-                status = f"Crawling in progress. Process PID: {pid}"
-            except Exception:
-                status = "Crawling in progress."
-            status_display.info(status)
-            progress_bar.progress(random.randint(0, 100))
-        else:
-            if "Crawling completed successfully." in log_content:
-                status_display.success("Crawling completed successfully.")
-            elif "Crawling has been stopped by the user." in log_content:
-                status_display.warning("Crawling stopped by user.")
-            else:
-                status_display.info("Idle")
-            progress_bar.empty()
-
-    with tabs[1]:
-        st.header("📄 Downloaded PDFs")
-        pdf_list = list_pdfs()
-        if pdf_list:
-            q = st.text_input("Filter by filename:", value="")
-            show = [p for p in pdf_list if q.lower() in p.lower()]
-            if not show:
-                st.info("No matching PDFs.")
-            else:
-                links = []
-                for pdf in show:
-                    pdf_path = os.path.join(DOWNLOADED_PDFS_DIR, pdf)
-                    with open(pdf_path, "rb") as f:
-                        b64 = base64.b64encode(f.read()).decode()
-                    href = f'<a href="data:application/octet-stream;base64,{b64}" download="{pdf}">{pdf}</a>'
-                    links.append(href)
-                st.markdown(f'<div class="chat-bubble">{"<br>".join(links)}</div>', unsafe_allow_html=True)
-                zip_filename = create_zip_file()
-                with open(zip_filename, "rb") as f:
-                    st.download_button(
-                        label="Download All PDFs 📥",
-                        data=f,
-                        file_name=zip_filename,
-                        mime="application/zip"
-                    )
-        else:
-            st.info("No PDFs downloaded yet.")
-
-    with tabs[2]:
-        st.header("📝 Logs")
-        log_content = read_log()
-        st.markdown(f"<div class='chat-bubble'><pre>{log_content}</pre></div>", unsafe_allow_html=True)
+    # Only the tab area polls; CSS, logo and sidebar are left alone between full reruns.
+    _live(render_tabs, run_every=2 if crawler_running else None)
 
     st.markdown("<div class='footer'>Developed with ❤️ using Streamlit</div>", unsafe_allow_html=True)
 
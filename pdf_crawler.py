@@ -3,36 +3,55 @@
 
 import os
 import sys
+import atexit
 import time
 import threading
 import logging
 import signal
 import re
+import json
+import hashlib
+import heapq
+import itertools
+from functools import lru_cache
 from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from urllib.parse import urlparse, urljoin, urlunparse, parse_qsl, urlencode
 import argparse
 
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from bs4 import BeautifulSoup, NavigableString, SoupStrainer
 import tldextract
 from urllib.robotparser import RobotFileParser
 
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service as ChromeService
 from selenium.webdriver.chrome.options import Options as ChromeOptions
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import WebDriverException, TimeoutException
 from webdriver_manager.chrome import ChromeDriverManager
 
 DOWNLOADED_PDFS_DIR = "downloaded_pdfs"
 LOG_FILE = "pdfcrawler.log"
+VALIDATORS_FILE = "pdf_validators.json"  # url -> ETag/Last-Modified of the copy on disk
+DOWNLOAD_CHUNK = 1024 * 1024
+MAX_PAGE_BYTES = 20 * 1024 * 1024  # larger "pages" are assets or junk, never worth parsing
+MAX_RETRY_AFTER = 30  # seconds; longer Retry-After asks are cut short rather than parking a worker
+PER_HOST_CONNECTIONS = 8  # concurrent requests to any one host, across page and PDF workers
 UA = "Mozilla/5.0 (compatible; UniversalPDFCrawler/1.0; +https://example.invalid)"
 
 # ----------------------------- Logging -----------------------------
+logger = logging.getLogger('pdf_crawler_logger')
+
 def setup_logger():
-    logger = logging.getLogger('pdf_crawler_logger')
+    """Attach file + console handlers once; importing this module leaves logging (and signals) alone."""
+    if logger.handlers:
+        return logger
     logger.setLevel(logging.DEBUG)
-    for h in logger.handlers[:]:
-        logger.removeHandler(h)
     fh = logging.FileHandler(LOG_FILE, mode='w', encoding="utf-8")
     fh.setLevel(logging.DEBUG)
     fh.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
@@ -43,23 +62,30 @@ def setup_logger():
     logger.addHandler(ch)
     return logger
 
-logger = setup_logger()
 stop_event = threading.Event()
+_save_lock = threading.Lock()
 
 def handle_signal(signum, frame):
-    logger.info(f"Received termination signal: {signum}. Stopping crawler...")
+    logger.info("Received termination signal: %s. Stopping crawler...", signum)
     stop_event.set()
 
-# Guard signals so "streamlit run pdf_crawler.py" does not explode
-try:
-    signal.signal(signal.SIGINT, handle_signal)
-    signal.signal(signal.SIGTERM, handle_signal)
-except Exception:
-    pass
+def install_signal_handlers():
+    # Guard signals so "streamlit run pdf_crawler.py" does not explode
+    try:
+        signal.signal(signal.SIGINT, handle_signal)
+        signal.signal(signal.SIGTERM, handle_signal)
+    except Exception:
+        pass
 
 # ----------------------------- URL helpers -----------------------------
+# bundled public-suffix snapshot: no network fetch on first use, and one shared instance
+_TLD = tldextract.TLDExtract(suffix_list_urls=())
+
+@lru_cache(maxsize=100_000)
 def canonicalize_url(u: str, keep_query=True) -> str:
     p = urlparse(u)
+    if p.scheme and p.netloc and not p.params and not (keep_query and p.query):
+        return f"{p.scheme.lower()}://{p.netloc.lower()}{p.path}"
     query = ""
     if keep_query and p.query:
         q = parse_qsl(p.query, keep_blank_values=True)
@@ -67,29 +93,74 @@ def canonicalize_url(u: str, keep_query=True) -> str:
         query = urlencode(q, doseq=True)
     return urlunparse((p.scheme.lower(), p.netloc.lower(), p.path, p.params, query, ""))
 
+SKIP_HREF_PREFIXES = ("#", "javascript:", "mailto:", "tel:")
+
+def is_followable_href(href: str) -> bool:
+    h = href.lstrip()[:11].lower()
+    return bool(h) and not h.startswith(SKIP_HREF_PREFIXES)
+
 def normalize_url(u: str, base: str) -> str:
+    if u.startswith(("http://", "https://")):
+        # already absolute: urljoin would hand it back unchanged, only the fragment goes
+        return u.partition("#")[0]
     absu = urljoin(base, u)
     p = urlparse(absu)
     return urlunparse((p.scheme, p.netloc, p.path, p.params, p.query, ""))
 
+@lru_cache(maxsize=100_000)
 def get_host(u: str) -> str:
     return urlparse(u).hostname or ""
 
+@lru_cache(maxsize=100_000)
+def _registered_domain(netloc: str) -> str:
+    e = _TLD(netloc)
+    return f"{e.domain}.{e.suffix}"
+
 def same_registered_domain(a: str, b: str) -> bool:
-    ea = tldextract.extract(a); eb = tldextract.extract(b)
-    return f"{ea.domain}.{ea.suffix}" == f"{eb.domain}.{eb.suffix}"
+    return _registered_domain(urlparse(a).netloc) == _registered_domain(urlparse(b).netloc)
+
+ROBOTS_CACHE = {}  # (scheme, netloc) -> (RobotFileParser or None when unavailable, fetched at, {url: allowed})
+ROBOTS_TTL = 6 * 3600
+ROBOTS_MAX_BYTES = 500 * 1024  # anything past this is ignored, as Google does
+
+def get_robots_entry(session: requests.Session, scheme: str, netloc: str):
+    key = (scheme, netloc)
+    cached = ROBOTS_CACHE.get(key)
+    if cached is not None and time.monotonic() - cached[1] < ROBOTS_TTL:
+        return cached
+    rp = RobotFileParser()
+    rp.set_url(f"{scheme}://{netloc}/robots.txt")
+    try:
+        # fetched through the crawl session (pooled connection, our UA) instead of rp.read()'s urllib
+        with session.get(rp.url, stream=True, timeout=20) as r:
+            # same rules as rp.read(): 401/403 deny, other 4xx allow, 5xx (server trouble) deny
+            if r.status_code in (401, 403) or r.status_code >= 500:
+                rp.disallow_all = True
+            elif r.status_code >= 400:
+                rp.allow_all = True
+            else:
+                body = r.raw.read(ROBOTS_MAX_BYTES, decode_content=True)
+                rp.parse(body.decode(r.encoding or "utf-8", errors="replace").splitlines())
+    except Exception as e:
+        logger.warning("Robots.txt unavailable for %s, assuming allowed: %s", netloc, e)
+        rp = None
+    # decisions live with their parser, so a refetched robots.txt starts with a clean memo
+    ROBOTS_CACHE[key] = entry = (rp, time.monotonic(), {})
+    return entry
 
-def is_allowed_by_robots(url: str, user_agent='*') -> bool:
+def is_allowed_by_robots(session: requests.Session, url: str, user_agent='*') -> bool:
     try:
         parsed = urlparse(url)
-        robots_url = f"{parsed.scheme}://{parsed.netloc}/robots.txt"
-        rp = RobotFileParser()
-        rp.set_url(robots_url); rp.read()
-        allowed = rp.can_fetch(user_agent, url)
-        logger.debug(f"Robots.txt allows crawling {url}: {allowed}")
-        return allowed
+        rp, _, decisions = get_robots_entry(session, parsed.scheme, parsed.netloc)
+        if rp is None: return True
+        key = (user_agent, url)
+        if key not in decisions:
+            # can_fetch walks every rule line; a URL seen as both page link and PDF pays once
+            decisions[key] = rp.can_fetch(user_agent, url)
+            logger.debug("Robots.txt allows crawling %s: %s", url, decisions[key])
+        return decisions[key]
     except Exception as e:
-        logger.warning(f"Robots.txt unavailable, assuming allowed for {url}: {e}")
+        logger.warning("Robots.txt unavailable, assuming allowed for %s: %s", url, e)
         return True
 
 def ensure_dir(path): os.makedirs(path, exist_ok=True)
@@ -100,44 +171,119 @@ def sanitize_filename(name: str) -> str:
     return "".join(c if c.isalnum() or c in keep else "_" for c in name)
 
 # ----------------------------- Networking -----------------------------
+class CappedRetry(Retry):
+    """Retry that honours Retry-After, but never sleeps longer than MAX_RETRY_AFTER."""
+    def get_retry_after(self, response):
+        seconds = super().get_retry_after(response)
+        return None if seconds is None else min(seconds, MAX_RETRY_AFTER)
+
 def build_session():
     s = requests.Session()
-    s.headers.update({"User-Agent": UA})
+    s.headers.update({"User-Agent": UA, "Accept-Encoding": "gzip, deflate"})
     s.max_redirects = 5
+    # keep-alive for the page fetches and every download worker (the default pool holds 10 per host);
+    # transient 429/5xx answers are retried with backoff (honouring a capped Retry-After) before we give up;
+    # connection failures (DNS, refused) get a single immediate retry, they rarely heal in seconds
+    retries = CappedRetry(total=3, connect=1, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504),
+                    allowed_methods=frozenset(["GET", "HEAD"]), raise_on_status=False)
+    adapter = HTTPAdapter(pool_connections=64, pool_maxsize=64, max_retries=retries)
+    s.mount("http://", adapter); s.mount("https://", adapter)
     return s
 
-def fetch_with_requests(session: requests.Session, url: str, timeout=30):
-    r = session.get(url, timeout=timeout)
-    r.raise_for_status()
-    ct = (r.headers.get("Content-Type") or "").lower()
-    return r, ct
+_host_slots = {}
+_host_slots_lock = threading.Lock()
+
+def host_slot(url: str) -> threading.BoundedSemaphore:
+    """Per-host semaphore; hold it around a request so no host sees more than PER_HOST_CONNECTIONS."""
+    host = get_host(url)
+    with _host_slots_lock:
+        sem = _host_slots.get(host)
+        if sem is None:
+            sem = _host_slots[host] = threading.BoundedSemaphore(PER_HOST_CONNECTIONS)
+    return sem
+
+def fetch_html(session: requests.Session, url: str, timeout=30):
+    """
+    (body bytes, declared charset or None) for an HTML page, or None when the response is not
+    HTML or too large. Streamed, so a PDF or image that landed in the page queue is dropped after
+    its headers (or first 1 KB) instead of being downloaded in full.
+    """
+    with session.get(url, stream=True, timeout=timeout) as r:
+        r.raise_for_status()
+        ct = (r.headers.get("Content-Type") or "").lower()
+        size = r.headers.get("Content-Length", "")
+        if size.isdigit() and int(size) > MAX_PAGE_BYTES:
+            logger.info("Skipping oversized page (%s bytes): %s", size, url)
+            return None
+        chunks = r.iter_content(64 * 1024)
+        body = bytearray(next(chunks, b""))
+        # untyped or mistyped markup still counts as HTML when it starts with a tag
+        if "html" not in ct and "xml" not in ct and body[:1024].lstrip()[:1] != b"<":
+            return None
+        for chunk in chunks:
+            body += chunk
+            if len(body) > MAX_PAGE_BYTES:
+                logger.info("Skipping oversized page (>%d bytes): %s", MAX_PAGE_BYTES, url)
+                return None
+        return bytes(body), (r.encoding if "charset=" in ct else None)
+
+@lru_cache(maxsize=1)
+def chromedriver_path() -> str:
+    # webdriver-manager checks versions (and may hit the network); once per run is enough
+    return ChromeDriverManager().install()
 
 def spin_up_driver():
     options = ChromeOptions()
+    options.page_load_strategy = "eager"  # DOM is enough; don't wait for images/stylesheets
     options.add_argument("--headless=new")
     options.add_argument("--disable-gpu")
     options.add_argument("--no-sandbox")
     options.add_argument("--disable-dev-shm-usage")
     options.add_argument("--window-size=1920,1080")
     options.add_argument("--disable-blink-features=AutomationControlled")
-    service = ChromeService(ChromeDriverManager().install())
+    service = ChromeService(chromedriver_path())
     driver = webdriver.Chrome(service=service, options=options)
     driver.set_page_load_timeout(60)
     return driver
 
+# One browser for the whole crawl; starting Chrome costs seconds, so it is only started on
+# first use and replaced only after a hard WebDriver error.
+_driver = None
+
+def get_driver():
+    global _driver
+    if _driver is None:
+        _driver = spin_up_driver()
+    return _driver
+
+def quit_driver():
+    global _driver
+    if _driver is not None:
+        try:
+            _driver.quit()
+        except Exception:
+            pass
+        _driver = None
+
+atexit.register(quit_driver)
+
 def fetch_with_selenium(url: str):
-    driver = None
     try:
-        driver = spin_up_driver()
+        driver = get_driver()
         driver.get(url)
-        time.sleep(2)
-        html = driver.page_source
-        cookies = driver.get_cookies()
-        return html, cookies, driver
-    except (TimeoutException, WebDriverException) as e:
-        logger.error(f"Selenium error on {url}: {e}")
-        if driver: driver.quit()
-        return None, [], None
+        try:
+            # wait for the first link instead of a fixed sleep; pages without links just time out
+            WebDriverWait(driver, 5).until(EC.presence_of_element_located((By.TAG_NAME, "a")))
+        except TimeoutException:
+            pass
+        return driver.page_source, driver
+    except TimeoutException as e:
+        logger.error("Selenium timeout on %s: %s", url, e)
+        return None, None
+    except WebDriverException as e:
+        logger.error("Selenium error on %s: %s", url, e)
+        quit_driver()
+        return None, None
 
 def apply_cookies_from_driver(session: requests.Session, driver):
     try:
@@ -148,43 +294,31 @@ def apply_cookies_from_driver(session: requests.Session, driver):
         pass
 
 # ----------------------------- PDF detection -----------------------------
-PDF_HINTS = (
-    ".pdf",
-    "FileDownloadServlet",
-    "FrontEndFileDownloadServlet",
-    "downloadFile",
-    "documentDownload",
-    "getDocument",
+# ".pdf" ending a path segment / query value (or followed by an escape, space or a further
+# extension such as doc.pdf.aspx), or a known document-download endpoint; not "x.pdfviewer"
+PDF_HINT_RE = re.compile(
+    r"\.pdf(?:$|[?#;&/.%\s])|FileDownloadServlet|downloadFile|documentDownload|getDocument",
+    re.I,
+)
+HTTP_RE = re.compile("http", re.I)  # cheap gate before the full URL regex, any case like it
+# absolute URLs in free text that already carry a PDF hint (before any #fragment), in one pass
+PDF_URL_IN_TEXT_RE = re.compile(
+    r"https?://[^\s'\"<>#]*?"
+    r"(?:\.pdf(?=[?#;&/.%\s'\"<>]|$)|FileDownloadServlet|downloadFile|documentDownload|getDocument)"
+    r"[^\s'\"<>]*",
+    re.I,
 )
-URL_RE = re.compile(r"https?://[^\s'\"<>]+", re.I)
+META_REFRESH_RE = re.compile("^refresh$", re.I)
+META_URL_RE = re.compile(r'url=([^;]+)', re.I)
+FILENAME_RE = re.compile(r'filename\*?=([^;]+)', re.I)
+VIEW_MORE_RE = re.compile(r"view\s*more\s*details", re.I)
 
 def looks_like_pdf_url(u: str) -> bool:
-    lu = u.lower()
-    return any(h in lu for h in PDF_HINTS) or lu.endswith(".pdf")
-
-def head_says_pdf(session: requests.Session, url: str, timeout=20) -> bool:
-    try:
-        r = session.head(url, allow_redirects=True, timeout=timeout)
-        ct = (r.headers.get("Content-Type") or "").lower()
-        cd = r.headers.get("Content-Disposition") or ""
-        if "application/pdf" in ct: return True
-        if ".pdf" in cd.lower():   return True
-    except Exception:
-        return False
-    return False
-
-def sniff_stream_is_pdf(session: requests.Session, url: str, timeout=30) -> bool:
-    try:
-        with session.get(url, stream=True, allow_redirects=True, timeout=timeout) as r:
-            r.raise_for_status()
-            chunk = next(r.iter_content(1024), b"")
-            return chunk.startswith(b"%PDF-")
-    except Exception:
-        return False
+    return PDF_HINT_RE.search(u) is not None
 
 def choose_filename(url: str, resp: requests.Response) -> str:
     cd = resp.headers.get("Content-Disposition", "")
-    m = re.search(r'filename\*?=([^;]+)', cd, flags=re.I)
+    m = FILENAME_RE.search(cd)
     if m:
         raw = m.group(1).strip().strip('"').strip("'")
         if "''" in raw: raw = raw.split("''", 1)[1]
@@ -197,219 +331,426 @@ def choose_filename(url: str, resp: requests.Response) -> str:
             fn = "download.pdf"
     return sanitize_filename(fn)
 
+_taken_names = {}   # dir -> folded names in use (finished or .part), snapshotted once per crawl
+_next_suffix = {}   # (dir, folded filename) -> next " (n)" to try
+
+def _fold(name: str) -> str:
+    # NTFS/APFS treat "Tender.pdf" and "tender.pdf" as one file; compare names the same way
+    return os.path.normcase(name).casefold()
+
 def uniquify(path: str) -> str:
-    base, ext = os.path.splitext(path)
-    i, new_path = 1, path
-    while os.path.exists(new_path):
-        new_path = f"{base} ({i}){ext}"; i += 1
-    return new_path
+    """Free name for path; callers hold _save_lock. Claims the name before returning."""
+    d, name = os.path.split(path)
+    taken = _taken_names.get(d)
+    if taken is None:
+        taken = _taken_names[d] = {_fold(n[:-5] if n.endswith(".part") else n) for n in os.listdir(d)}
+    base, ext = os.path.splitext(name)
+    key = (d, _fold(name))
+    i, new_name = _next_suffix.get(key, 1), name
+    while _fold(new_name) in taken:
+        new_name = f"{base} ({i}){ext}"; i += 1
+    _next_suffix[key] = i
+    taken.add(_fold(new_name))
+    return os.path.join(d, new_name)
+
+# ----------------------------- Re-crawl validators -----------------------------
+_validators = {}
+_validators_lock = threading.Lock()
+_claimed_paths = {}  # path -> URL saved (or kept) there during this crawl
+
+def load_validators():
+    try:
+        with open(VALIDATORS_FILE, encoding="utf-8") as f:
+            _validators.update(json.load(f))
+    except (FileNotFoundError, ValueError):
+        pass
+
+def save_validators():
+    with _validators_lock:
+        data = dict(_validators)
+    tmp = VALIDATORS_FILE + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp, VALIDATORS_FILE)
+
+def file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(DOWNLOAD_CHUNK), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def cached_copy(url: str):
+    """
+    (conditional headers, local path) if an earlier run saved this URL and that exact file is
+    still there. Filenames get reused once downloaded_pdfs/ is wiped, so the size and sha256
+    recorded at save time must match, and no other URL may have claimed the path this run.
+    """
+    with _validators_lock:
+        v = _validators.get(url)
+        if v and _claimed_paths.get(v["path"], url) != url:
+            del _validators[url]; return None
+    if not v or "sha256" not in v: return None
+    try:
+        if os.path.getsize(v["path"]) != v["size"] or file_sha256(v["path"]) != v["sha256"]:
+            return None
+    except OSError:
+        return None
+    headers = {}
+    if v.get("etag"): headers["If-None-Match"] = v["etag"]
+    if v.get("last_modified"): headers["If-Modified-Since"] = v["last_modified"]
+    return (headers, v["path"]) if headers else None
+
+def claim_path(url: str, path: str):
+    """Record that path now holds url's PDF; entries of other URLs pointing there are stale."""
+    with _validators_lock:
+        _claimed_paths[path] = url
+        for other in [u for u, v in _validators.items() if v["path"] == path and u != url]:
+            del _validators[other]
+
+def remember_validators(url: str, resp: requests.Response, path: str, size: int, sha256: str):
+    etag, last_modified = resp.headers.get("ETag"), resp.headers.get("Last-Modified")
+    if etag or last_modified:
+        with _validators_lock:
+            _validators[url] = {"etag": etag, "last_modified": last_modified, "path": path,
+                                "size": size, "sha256": sha256}
 
 def download_pdf(session: requests.Session, url: str, out_dir: str) -> str | None:
     ensure_dir(out_dir)
+    cached = cached_copy(url)
     try:
-        with session.get(url, stream=True, allow_redirects=True, timeout=60) as r:
+        with session.get(url, stream=True, allow_redirects=True, timeout=60,
+                         headers=cached[0] if cached else None) as r:
+            if cached and r.status_code == 304:
+                claim_path(url, cached[1])
+                logger.info("Not modified, keeping: %s", os.path.basename(cached[1]))
+                return cached[1]
             r.raise_for_status()
             ct = (r.headers.get("Content-Type") or "").lower()
+            head = b""
             if "application/pdf" not in ct:
                 head = next(r.iter_content(1024), b"")
                 if not head.startswith(b"%PDF-"):
-                    logger.info(f"Not a PDF after sniff: {url}")
+                    logger.info("Not a PDF after sniff: %s", url)
                     return None
-                filename = choose_filename(url, r)
+            filename = choose_filename(url, r)
+            # pick the name and create the file in one step so parallel downloads never collide;
+            # bytes go to <name>.part and only a complete file is renamed into place
+            with _save_lock:
                 path = uniquify(os.path.join(out_dir, filename))
-                with open(path, "wb") as f:
+                part = path + ".part"
+                f = open(part, "wb")
+            # Content-Length counts encoded bytes, so it is only usable for identity bodies
+            expected = r.headers.get("Content-Length", "")
+            expected = int(expected) if expected.isdigit() and not r.headers.get("Content-Encoding") else None
+            digest = hashlib.sha256(head)
+            try:
+                with f:
+                    if expected and hasattr(os, "posix_fallocate"):
+                        try:
+                            os.posix_fallocate(f.fileno(), 0, expected)  # one contiguous extent
+                        except OSError:
+                            pass
                     f.write(head)
-                    for chunk in r.iter_content(1024 * 64):
-                        if stop_event.is_set(): return None
-                        if chunk: f.write(chunk)
-                logger.info(f"Downloaded PDF (sniff): {os.path.basename(path)}")
-                return path
-            filename = choose_filename(url, r)
-            path = uniquify(os.path.join(out_dir, filename))
-            with open(path, "wb") as f:
-                for chunk in r.iter_content(1024 * 64):
-                    if stop_event.is_set(): return None
-                    if chunk: f.write(chunk)
-            logger.info(f"Downloaded PDF: {os.path.basename(path)}")
+                    written = len(head)
+                    for chunk in r.iter_content(DOWNLOAD_CHUNK):
+                        if stop_event.is_set(): break
+                        if chunk:
+                            f.write(chunk); written += len(chunk); digest.update(chunk)
+                if stop_event.is_set():
+                    os.remove(part); return None
+                if expected is not None and expected != written:
+                    raise IOError(f"truncated ({written} of {expected} bytes)")
+                os.replace(part, path)
+            except BaseException:
+                try:
+                    os.remove(part)
+                except OSError:
+                    pass
+                raise
+            claim_path(url, path)
+            remember_validators(url, r, path, written, digest.hexdigest())
+            logger.info("Downloaded PDF%s: %s", " (sniff)" if head else "", os.path.basename(path))
             return path
     except Exception as e:
-        logger.error(f"Failed to download PDF from {url}: {e}")
+        logger.error("Failed to download PDF from %s: %s", url, e)
         return None
 
 # ----------------------------- HTML parsing -----------------------------
-def soup_from_html(html: str): return BeautifulSoup(html, "lxml")
-
-def extract_candidate_pdf_urls_from_soup(soup: BeautifulSoup, base_url: str) -> set[str]:
-    found = set()
-    for a in soup.find_all("a", href=True):
-        href = normalize_url(a["href"], base_url)
-        if looks_like_pdf_url(href):
-            found.add(href)
-    for tag in soup.find_all(["embed","object","iframe"]):
-        src = tag.get("src") or tag.get("data")
-        if not src: continue
-        href = normalize_url(src, base_url)
+# Only these tags are ever inspected; everything else (tables, divs, styling) is never built.
+# Free text outside them is dropped too, so raw-URL scraping covers script bodies and link text.
+PAGE_STRAINER = SoupStrainer(["a", "embed", "object", "iframe", "meta", "script"])
+
+def soup_from_html(html, encoding=None):
+    # html may be raw bytes: lxml then decodes once, honouring <meta charset> when the header has none
+    return BeautifulSoup(html, "lxml", parse_only=PAGE_STRAINER, from_encoding=encoding)
+
+def scan_page(soup: BeautifulSoup, base_url: str) -> tuple[dict[str, None], list[str]]:
+    """
+    PDF candidates plus the raw followable <a href> values, gathered in one walk over the tree.
+    Candidates are dict keys (an insertion-ordered set), so they come back in document order.
+    """
+    found, hrefs = {}, []
+
+    def add(u: str):
+        href = normalize_url(u.strip(), base_url)
         if looks_like_pdf_url(href):
-            found.add(href)
-    for meta in soup.find_all("meta", attrs={"http-equiv": re.compile("^refresh$", re.I)}):
-        content = meta.get("content") or ""
-        m = re.search(r'url=([^;]+)', content, flags=re.I)
-        if m:
-            href = normalize_url(m.group(1).strip(), base_url)
-            if looks_like_pdf_url(href):
-                found.add(href)
-    # raw URL scraping from scripts/text
-    chunks = []
-    for s in soup.find_all("script"):
-        if s.string: chunks.append(s.string)
-    chunks.append(soup.get_text(" "))
-    for chunk in chunks:
-        for u in URL_RE.findall(chunk or ""):
-            href = normalize_url(u, base_url)
-            if looks_like_pdf_url(href):
-                found.add(href)
-    return found
-
-def extract_detail_links_for_gepnic(soup: BeautifulSoup, base_url: str) -> set[str]:
-    """Single-page drilldown: find tender detail links typical to GePNIC pages."""
-    detail = set()
+            found[href] = None
+
+    for node in soup.descendants:
+        if isinstance(node, NavigableString):
+            # raw URL scraping from script bodies and link text
+            if HTTP_RE.search(node):
+                for m in PDF_URL_IN_TEXT_RE.finditer(node): found[normalize_url(m.group(0), base_url)] = None
+            continue
+        name = node.name
+        if name == "a":
+            raw = node.get("href")
+            if raw is None or not is_followable_href(raw): continue
+            raw = raw.strip()  # browsers ignore surrounding whitespace; "a.pdf " is still a PDF link
+            hrefs.append(raw)
+            # cheap string test on the raw href; only candidates pay for urljoin
+            if looks_like_pdf_url(raw): found[normalize_url(raw, base_url)] = None
+        elif name in ("embed", "object", "iframe"):
+            src = node.get("src") or node.get("data")
+            if src: add(src)
+        elif name == "meta" and META_REFRESH_RE.match(node.get("http-equiv") or ""):
+            m = META_URL_RE.search(node.get("content") or "")
+            if m: add(m.group(1).strip())
+    return found, hrefs
+
+def extract_candidate_pdf_urls_from_soup(soup: BeautifulSoup, base_url: str) -> dict[str, None]:
+    return scan_page(soup, base_url)[0]
+
+def extract_detail_links_for_gepnic(soup: BeautifulSoup, base_url: str) -> dict[str, None]:
+    """Single-page drilldown: find tender detail links typical to GePNIC pages (in page order)."""
+    detail = {}
     for a in soup.find_all("a", href=True):
-        txt = (a.get_text(" ") or "").strip()
-        href = normalize_url(a["href"], base_url)
-        if "FrontEndViewTender" in href or re.search(r"view\s*more\s*details", txt, re.I):
-            detail.add(href)
+        raw = a["href"]
+        # urljoin never adds or drops "FrontEndViewTender", so test the raw href before the text
+        if "FrontEndViewTender" in raw or VIEW_MORE_RE.search(a.get_text(" ")):
+            detail[normalize_url(raw, base_url)] = None
     return detail
 
-def get_page_soup(session: requests.Session, url: str, render: str):
-    html, cookies, driver = None, [], None
-    # requests first
+def page_has_links(soup) -> bool:
+    return soup is not None and (soup.find("a", href=True) or soup.find(["embed","object","iframe"])) is not None
+
+def fetch_static_soup(session: requests.Session, url: str):
+    """Plain requests fetch + parse; safe to run on a worker thread."""
     try:
-        resp, ct = fetch_with_requests(session, url)
-        if "text/html" in ct or resp.text.strip().startswith("<"):
-            html = resp.text
+        page = fetch_html(session, url)
+        if page is not None:
+            return soup_from_html(*page)
     except Exception as e:
-        logger.warning(f"Requests fetch failed on {url}: {e}")
-    # fallback to selenium if needed
-    if (html is None or "href" not in html) and render in ("auto","always"):
-        html, cookies, driver = fetch_with_selenium(url)
+        logger.warning("Requests fetch failed on %s: %s", url, e)
+    return None
+
+def render_if_needed(session: requests.Session, url: str, render: str, soup):
+    # browser only when forced, or when the static HTML has nothing to follow (JS-built page).
+    # There is a single browser, so this always runs on the main thread.
+    if render == "always" or (render == "auto" and not page_has_links(soup)):
+        html, driver = fetch_with_selenium(url)
         if html and driver:
             apply_cookies_from_driver(session, driver)
-    soup = soup_from_html(html) if html else None
-    if driver: driver.quit()
+            soup = soup_from_html(html)
     return soup
 
+def get_page_soup(session: requests.Session, url: str, render: str):
+    # requests first (skipped when the user asked for the browser every time)
+    soup = fetch_static_soup(session, url) if render != "always" else None
+    return render_if_needed(session, url, render, soup)
+
 # ----------------------------- Crawl -----------------------------
-def crawl(start_url: str, scope: str, render: str, max_pages: int, max_pdfs: int, delay: float, respect_robots: bool):
+PRIORITY_KEYWORDS = ("tender", "document", "download", "notice", "pdf")
+
+def url_priority(u: str) -> tuple[int, int]:
+    """Best-first sort key (lower first): more PDF-ish keywords, then shallower paths."""
+    lu = u.lower()
+    return -sum(kw in lu for kw in PRIORITY_KEYWORDS), urlparse(u).path.count("/")
+
+def make_seen_set(bloom: bool):
+    """Page de-dup store: a set of URL hashes, or with --bloom a constant-memory Bloom filter."""
+    if bloom:
+        try:
+            from pybloom_live import ScalableBloomFilter
+            return ScalableBloomFilter(initial_capacity=1 << 20, error_rate=1e-4)
+        except ImportError:
+            logger.warning("--bloom needs pybloom_live (pip install pybloom-live); using an exact set.")
+    return set()
+
+def crawl(start_url: str, scope: str, render: str, max_pages: int, max_pdfs: int, delay: float, respect_robots: bool, workers: int = 4, bloom: bool = False, stable_order: bool = False, strategy: str = "bfs"):
     ensure_dir(DOWNLOADED_PDFS_DIR)
+    _taken_names.clear(); _next_suffix.clear(); _claimed_paths.clear()
+    load_validators()
     session = build_session()
-    visited_pages = set()
-    downloaded_urls = set()
-    pages_crawled = 0
+    seen_pdf_urls = set()  # hashes of canonical URLs, so query-order/host-case variants are fetched once
     pdfs_downloaded = 0
-
-    def accept_pdf(u: str) -> bool:
-        if u in downloaded_urls: return False
-        # stay inside fence
-        if scope == "page":
-            if get_host(u) != get_host(start_url): return False
-        elif scope == "host":
-            if get_host(u) != get_host(start_url): return False
-        elif scope == "domain":
-            if not same_registered_domain(u, start_url): return False
-        # verify type
-        if u.lower().endswith(".pdf") or looks_like_pdf_url(u):
-            return head_says_pdf(session, u) or sniff_stream_is_pdf(session, u)
-        return head_says_pdf(session, u) or sniff_stream_is_pdf(session, u)
-
-    # ------------- PAGE MODE (with one-level drilldown) -------------
-    if scope == "page":
-        if respect_robots and not is_allowed_by_robots(start_url):
-            logger.info(f"Disallowed by robots.txt: {start_url}")
-            logger.info("Crawling completed successfully.")
-            return
-
-        logger.info(f"Crawling (single page): {start_url}")
-        soup = get_page_soup(session, start_url, render)
-        if not soup:
-            logger.info("No HTML obtained; nothing to do.")
-            logger.info("Crawling completed successfully.")
-            return
-
-        candidates = extract_candidate_pdf_urls_from_soup(soup, start_url)
-
-        # If none on listing, probe detail pages linked ON THIS PAGE only (non-recursive)
-        if not candidates:
-            detail_links = extract_detail_links_for_gepnic(soup, start_url)
-            logger.info(f"No PDFs on page. Probing {len(detail_links)} detail link(s) for PDFs...")
-            for durl in sorted(detail_links):
-                if stop_event.is_set(): break
-                if get_host(durl) != get_host(start_url): continue
-                if respect_robots and not is_allowed_by_robots(durl): continue
-                dsoup = get_page_soup(session, durl, render)
-                if not dsoup: continue
-                candidates |= extract_candidate_pdf_urls_from_soup(dsoup, durl)
-                time.sleep(delay)
-
-        for u in sorted(candidates):
-            if stop_event.is_set(): break
-            if pdfs_downloaded >= max_pdfs:
-                logger.info(f"Reached maximum PDFs ({max_pdfs})."); break
-            if accept_pdf(u):
-                path = download_pdf(session, u, DOWNLOADED_PDFS_DIR)
-                if path:
-                    downloaded_urls.add(u)
-                    pdfs_downloaded += 1
-                    time.sleep(delay)
-
-        logger.info("Crawling completed successfully.")
-        return
-
-    # ------------- HOST/DOMAIN MODES (BFS) -------------
-    q = deque([start_url])
-    while q and not stop_event.is_set():
-        page = q.popleft()
-        page_canon = canonicalize_url(page)
-        if page_canon in visited_pages: continue
-
-        if respect_robots and not is_allowed_by_robots(page):
-            logger.info(f"Disallowed by robots.txt: {page}")
-            visited_pages.add(page_canon); continue
-
-        if scope == "host" and get_host(page) != get_host(start_url): continue
-        if scope == "domain" and not same_registered_domain(page, start_url): continue
-
-        logger.info(f"Crawling: {page}")
-        visited_pages.add(page_canon)
-        pages_crawled += 1
-
-        soup = get_page_soup(session, page, render)
-        if not soup:
-            if pages_crawled >= max_pages: break
-            continue
-
-        pdf_candidates = extract_candidate_pdf_urls_from_soup(soup, page)
-        for u in sorted(pdf_candidates):
-            if stop_event.is_set(): break
+    pdfs_checked = 0
+    # PDF verification + download run on a small pool; BFS pages are prefetched on a second one
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="pdf")
+    inflight = {}  # Future -> candidate URL
+
+    def ordered(urls):
+        # candidates arrive in discovery order; sorting is only paid for when asked for
+        return sorted(urls) if stable_order else urls
+
+    def report_progress():
+        # machine-readable line for the UI progress bar (file log only)
+        logger.debug("PROGRESS pdfs_downloaded=%d pdfs_checked=%d pdfs_seen=%d", pdfs_downloaded, pdfs_checked, len(seen_pdf_urls))
+
+    def new_pdf_candidates(found) -> list[str]:
+        fresh = []
+        for u in found:
+            key = hash(canonicalize_url(u))
+            if key in seen_pdf_urls: continue
+            seen_pdf_urls.add(key); fresh.append(u)
+        return fresh
+
+    def in_fence(u: str) -> bool:
+        if scope == "domain":
+            return same_registered_domain(u, start_url)
+        return get_host(u) == get_host(start_url)  # page and host scopes
+
+    def fetch_pdf(u: str) -> str | None:
+        # runs on a pool thread. No separate HEAD/sniff round trips: download_pdf's own GET
+        # checks Content-Type or the %PDF- magic and drops non-PDFs after the first 1 KB
+        if stop_event.is_set(): return None
+        with host_slot(u):
+            path = download_pdf(session, u, DOWNLOADED_PDFS_DIR)
+        if path: time.sleep(delay)
+        return path
+
+    def collect(block: bool):
+        nonlocal pdfs_downloaded, pdfs_checked
+        if not inflight: return
+        done, _ = wait(inflight, timeout=None if block else 0, return_when=FIRST_COMPLETED)
+        for fut in done:
+            u = inflight.pop(fut)
+            pdfs_checked += 1
+            try:
+                path = fut.result()
+            except Exception as e:
+                logger.error("PDF worker failed on %s: %s", u, e)
+                path = None
+            if path:
+                pdfs_downloaded += 1
+            report_progress()
+
+    def submit_pdfs(candidates: list[str], check_robots: bool):
+        """Hands candidates to the download pool, keeping the total within max_pdfs."""
+        nonlocal pdfs_checked
+        for u in ordered(candidates):
+            if stop_event.is_set(): return
+            collect(block=False)
+            # never keep more downloads in flight than could still count towards max_pdfs
+            while inflight and (len(inflight) >= workers or pdfs_downloaded + len(inflight) >= max_pdfs):
+                collect(block=True)
             if pdfs_downloaded >= max_pdfs:
-                logger.info(f"Reached maximum PDFs ({max_pdfs})."); break
-            if respect_robots and not is_allowed_by_robots(u): continue
-            if accept_pdf(u):
-                path = download_pdf(session, u, DOWNLOADED_PDFS_DIR)
-                if path:
-                    downloaded_urls.add(u); pdfs_downloaded += 1
+                logger.info("Reached maximum PDFs (%d).", max_pdfs); return
+            # fence first: off-site candidates must not trigger a robots.txt fetch for their host
+            if not in_fence(u) or (check_robots and not is_allowed_by_robots(session, u)):
+                pdfs_checked += 1; report_progress(); continue
+            inflight[pool.submit(fetch_pdf, u)] = u
+
+    def crawl_pages():
+        # ------------- PAGE MODE (with one-level drilldown) -------------
+        if scope == "page":
+            if respect_robots and not is_allowed_by_robots(session, start_url):
+                logger.info("Disallowed by robots.txt: %s", start_url)
+                return
+
+            logger.info("Crawling (single page): %s", start_url)
+            soup = get_page_soup(session, start_url, render)
+            if not soup:
+                logger.info("No HTML obtained; nothing to do.")
+                return
+
+            candidates = extract_candidate_pdf_urls_from_soup(soup, start_url)
+
+            # If none on listing, probe detail pages linked ON THIS PAGE only (non-recursive)
+            if not candidates:
+                detail_links = extract_detail_links_for_gepnic(soup, start_url)
+                logger.info("No PDFs on page. Probing %d detail link(s) for PDFs...", len(detail_links))
+                for durl in ordered(detail_links):
+                    if stop_event.is_set(): break
+                    if get_host(durl) != get_host(start_url): continue
+                    if respect_robots and not is_allowed_by_robots(session, durl): continue
+                    dsoup = get_page_soup(session, durl, render)
+                    if not dsoup: continue
+                    candidates |= extract_candidate_pdf_urls_from_soup(dsoup, durl)
                     time.sleep(delay)
 
-        if pages_crawled >= max_pages: break
+            submit_pdfs(new_pdf_candidates(candidates), check_robots=False)
+            return
 
-        for a in soup.find_all("a", href=True):
-            href = normalize_url(a["href"], page)
-            if scope == "host" and get_host(href) != get_host(start_url): continue
-            if scope == "domain" and not same_registered_domain(href, start_url): continue
-            canon = canonicalize_url(href)
-            if canon not in visited_pages:
-                q.append(href)
+        # ------------- HOST/DOMAIN MODES (BFS) -------------
+        pages_crawled = 0
+        start_host = get_host(start_url)
+        # only in-scope, normalized URLs are ever enqueued
+        if strategy == "best-first":
+            q, tiebreak = [], itertools.count()  # heap; the counter keeps equal scores FIFO
+            def push(u): heapq.heappush(q, (url_priority(u), next(tiebreak), u))
+            def pop(): return heapq.heappop(q)[2]
+        else:
+            q = deque()
+            push, pop = q.append, q.popleft
+        push(start_url)
+        queued = make_seen_set(bloom)  # hash of every page ever enqueued, so each is fetched once
+        queued.add(hash(canonicalize_url(start_url)))
+        page_pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="page")
+        pending = deque()  # (url, Future) of pages being fetched, in frontier order
+
+        def fetch_page(url: str):
+            # runs on a pool thread: static fetch + parse only, the browser stays on this thread
+            if render == "always" or stop_event.is_set(): return None
+            with host_slot(url):
+                soup = fetch_static_soup(session, url)
+            time.sleep(delay)
+            return soup
+
+        try:
+            while (q or pending) and not stop_event.is_set():
+                # keep up to `workers` pages fetching ahead of the one being processed
+                while q and len(pending) < workers and pages_crawled < max_pages:
+                    page = pop()
+                    if respect_robots and not is_allowed_by_robots(session, page):
+                        logger.info("Disallowed by robots.txt: %s", page)
+                        continue
+                    logger.info("Crawling: %s", page)
+                    pages_crawled += 1
+                    pending.append((page, page_pool.submit(fetch_page, page)))
+                if not pending: break
+
+                page, fut = pending.popleft()
+                soup = render_if_needed(session, page, render, fut.result())
+                if not soup: continue
+
+                found, hrefs = scan_page(soup, page)
+                pdf_candidates = new_pdf_candidates(found)
+                submit_pdfs(pdf_candidates, check_robots=respect_robots)
+
+                if pages_crawled >= max_pages: continue  # page budget spent, stop growing the queue
+
+                for raw in hrefs:
+                    href = normalize_url(raw, page)
+                    if scope == "host" and get_host(href) != start_host: continue
+                    if scope == "domain" and not same_registered_domain(href, start_url): continue
+                    key = hash(canonicalize_url(href))
+                    if key not in queued:
+                        queued.add(key)
+                        push(href)
+        finally:
+            page_pool.shutdown(wait=False, cancel_futures=True)
 
-        time.sleep(delay)
+    try:
+        crawl_pages()
+    finally:
+        # let queued downloads finish unless we are being stopped
+        while inflight and not stop_event.is_set():
+            collect(block=True)
+        pool.shutdown(wait=not stop_event.is_set(), cancel_futures=True)
+        quit_driver()
+        save_validators()
 
     logger.info("Crawling completed successfully.")
 
@@ -422,23 +763,31 @@ def main():
     parser.add_argument("--max-pages", type=int, default=100)
     parser.add_argument("--max-pdfs", type=int, default=200)
     parser.add_argument("--delay", type=float, default=0.5)
+    parser.add_argument("--workers", type=int, default=4, help="Parallel page fetches and PDF downloads")
+    parser.add_argument("--strategy", choices=["bfs","best-first"], default="bfs",
+                        help="Page order for host/domain crawls; best-first favours tender/document/download URLs")
+    parser.add_argument("--stable-order", action="store_true", help="Process candidates in sorted order (reproducible runs)")
+    parser.add_argument("--bloom", action="store_true", help="Bloom-filter page de-dup for very large crawls (needs pybloom_live)")
     group = parser.add_mutually_exclusive_group()
     group.add_argument("--respect-robots", dest="respect_robots", action="store_true", default=True)
     group.add_argument("--ignore-robots",  dest="respect_robots", action="store_false")
     args = parser.parse_args()
 
+    setup_logger()
+    install_signal_handlers()
     start_url = args.url.strip()
     if not start_url.startswith("http"): start_url = "http://" + start_url
 
-    logger.info(f"Scope: {args.scope} | Render: {args.render} | MaxPages={args.max_pages} | MaxPDFs={args.max_pdfs} | Delay={args.delay}s | RespectRobots={args.respect_robots}")
-    logger.info(f"Started crawling: {start_url}")
+    logger.info("Scope: %s | Render: %s | MaxPages=%s | MaxPDFs=%s | Delay=%ss | Workers=%s | RespectRobots=%s",
+                args.scope, args.render, args.max_pages, args.max_pdfs, args.delay, args.workers, args.respect_robots)
+    logger.info("Started crawling: %s", start_url)
 
     try:
-        crawl(start_url, args.scope, args.render, args.max_pages, args.max_pdfs, args.delay, args.respect_robots)
+        crawl(start_url, args.scope, args.render, args.max_pages, args.max_pdfs, args.delay, args.respect_robots, max(1, args.workers), args.bloom, args.stable_order, args.strategy)
     except KeyboardInterrupt:
         logger.info("Interrupted by user.")
     except Exception as e:
-        logger.error(f"Fatal error: {e}")
+        logger.error("Fatal error: %s", e)
     finally:
         # Make it easy for the UI to detect a graceful end
         pass